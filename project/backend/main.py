@@ -1,19 +1,82 @@
 # backend/main.py
 
 import os
+import asyncio
 import logging
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Form
+import orjson
+from contextlib import asynccontextmanager, suppress
+from fastapi import FastAPI, Request, UploadFile, File, HTTPException, Depends, Form
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional
-from models import TranscriptionRequest, TranscriptionResponse
-from utils import transcribe_audio
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from typing import Optional, List
+from models import TranscriptionRequest, TranscriptionResponse, BatchTranscriptionResponse
+from utils import (
+    transcribe_audio,
+    transcribe_batch_audio,
+    transcribe_spooled_audio,
+    spool_upload,
+    preload_model,
+    AVAILABLE_MODELS,
+    ensure_queue_capacity,
+    FileTooLargeError,
+    ServerBusyError,
+    MAX_FILE_SIZE
+)
 import uvicorn
 logger = logging.getLogger(__name__)
+
+ALLOWED_EXTENSIONS = [".mp3", ".wav", ".m4a", ".flac", ".mov"]
+# Maximum number of files accepted by a single batch request
+MAX_BATCH_FILES = 16
+# Allowance for multipart boundaries and form fields on top of file bytes
+MAX_FORM_OVERHEAD = 1024 * 1024
+# Endpoints that answer with Server-Sent Events and must not be buffered
+STREAM_PATHS = {"/transcribe/stream/"}
+# Seconds between keep-alive comments on an idle event stream
+SSE_HEARTBEAT_INTERVAL = 15
+# Streaming transcriptions in flight; holds a reference so a job outlives
+# a client that disconnects
+STREAM_JOBS = set()
+
+
+async def load_whisper_model(app: FastAPI):
+    """Load the Whisper model and publish it on app.state once ready."""
+    logger.info("Loading Whisper model...")
+    try:
+        app.state.whisper_model = await preload_model()
+    except Exception as e:
+        # Kept so /healthz reports the failure instead of loading forever
+        app.state.model_error = e
+        logger.exception("Failed to load Whisper model")
+        return
+    logger.info("Whisper model loaded")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the Whisper model once at startup instead of on the first request.
+    # The load runs in the background so the server (and /healthz) comes up
+    # immediately; transcriptions queue behind it on the worker thread.
+    app.state.whisper_model = None
+    app.state.model_error = None
+    app.state.model_loader = asyncio.create_task(load_whisper_model(app))
+    yield
+    # Don't leave the load running past shutdown
+    app.state.model_loader.cancel()
+    with suppress(asyncio.CancelledError):
+        await app.state.model_loader
+
+
 # Create FastAPI app
 app = FastAPI(
     title="MLX Whisper Transcription API",
     description="API for transcribing audio files using MLX Whisper",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan,
+    # orjson serializes large segment lists much faster than stdlib json
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware to allow cross-origin requests
@@ -26,6 +89,44 @@ app.add_middleware(
     allow_headers=["Content-Type", "Authorization"],
 )
 
+class JSONGZipMiddleware:
+    """
+    GZipMiddleware that leaves the event-stream endpoint uncompressed.
+
+    Starlette releases before 0.46 gzip text/event-stream responses too,
+    buffering every event until the stream ends.
+    """
+
+    def __init__(self, app, minimum_size: int = 500):
+        self.app = app
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in STREAM_PATHS:
+            await self.app(scope, receive, send)
+        else:
+            await self.gzip(scope, receive, send)
+
+
+# Compress JSON responses; word-timestamp payloads shrink by roughly 10x
+app.add_middleware(JSONGZipMiddleware, minimum_size=1024)
+
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    """
+    Reject oversized requests from their Content-Length header, before
+    any of the body is read. Per-file limits are still enforced while
+    uploads are saved, which also covers chunked requests.
+    """
+    max_files = MAX_BATCH_FILES if request.url.path == "/transcribe_batch/" else 1
+    max_size = MAX_FILE_SIZE * max_files + MAX_FORM_OVERHEAD
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_size:
+        return ORJSONResponse(
+            status_code=413, content={"detail": "File too large (max 100MB)"})
+    return await call_next(request)
+
 # Root endpoint
 
 
@@ -34,9 +135,23 @@ async def root():
     return {"message": "MLX Whisper Transcription API"}
 
 
-@app.post("/transcribe/", response_model=TranscriptionResponse, tags=["transcription"])
-async def transcribe_file(
-    file: UploadFile = File(...),
+@app.get("/healthz", tags=["root"])
+async def healthz():
+    """
+    Report readiness: 503 until the Whisper model has been loaded, 500 if
+    loading it failed.
+    """
+    if app.state.model_error is not None:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Model failed to load: {app.state.model_error}")
+    if app.state.whisper_model is None:
+        raise HTTPException(status_code=503, detail="Model is loading")
+    return {"status": "ok"}
+
+
+def transcription_settings(
+    model: Optional[str] = Form(None),
     language: Optional[str] = Form(None),
     word_timestamps: bool = Form(False),
     fp16: bool = Form(True),
@@ -44,41 +159,200 @@ async def transcribe_file(
     no_speech_threshold: float = Form(0.6),
     hallucination_silence_threshold: Optional[float] = Form(None),
     condition_on_previous_text: bool = Form(True)
-):
+) -> TranscriptionRequest:
+    """Collect the transcription settings sent as form fields."""
+    if model is not None and model not in AVAILABLE_MODELS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown model. Available models: {', '.join(AVAILABLE_MODELS)}"
+        )
+
+    return TranscriptionRequest(
+        model=model,
+        language=language,
+        word_timestamps=word_timestamps,
+        fp16=fp16,
+        best_of=best_of,
+        no_speech_threshold=no_speech_threshold,
+        hallucination_silence_threshold=hallucination_silence_threshold,
+        condition_on_previous_text=condition_on_previous_text
+    )
+
+
+def validate_upload(file: UploadFile) -> str:
     """
-    Transcribe an audio file using MLX Whisper
+    Check an upload's size and type, returning its lowercased extension.
     """
-    # Check file size (limit to 25MB for example)
-    if file.size > 100 * 1024 * 1024:
+    # Reject early when the client reported the size; otherwise the limit
+    # is enforced while the upload is streamed to disk
+    if file.size is not None and file.size > MAX_FILE_SIZE:
         raise HTTPException(
-            status_code=400, detail="File too large (max 100MB)")
+            status_code=400, detail=f"File too large (max 100MB): {file.filename}")
 
     # Check file type
-    allowed_extensions = [".mp3", ".wav", ".m4a", ".flac", ".mov"]
     file_ext = os.path.splitext(file.filename)[1].lower()
-    if file_ext not in allowed_extensions:
+    if file_ext not in ALLOWED_EXTENSIONS:
         raise HTTPException(
             status_code=400,
-            detail=f"Unsupported file format. Allowed formats: {', '.join(allowed_extensions)}"
+            detail=f"Unsupported file format. Allowed formats: {', '.join(ALLOWED_EXTENSIONS)}"
         )
+    return file_ext
+
+
+def server_busy(error: ServerBusyError) -> HTTPException:
+    """The 429 returned when the MLX queue is full."""
+    return HTTPException(
+        status_code=429, detail=str(error), headers={"Retry-After": "30"})
 
-    # Read file content
-    file_content = await file.read()
+
+@app.post("/transcribe/", response_model=TranscriptionResponse, tags=["transcription"])
+async def transcribe_file(
+    file: UploadFile = File(...),
+    settings: TranscriptionRequest = Depends(transcription_settings)
+):
+    """
+    Transcribe an audio file using MLX Whisper
+    """
+    file_ext = validate_upload(file)
 
     try:
-        # Process the audio
+        # Process the audio; the MLX slot is only taken after a cache miss
         result = await transcribe_audio(
-            file_content,
-            language=language,
-            word_timestamps=word_timestamps,
-            fp16=fp16,
-            best_of=best_of,
-            no_speech_threshold=no_speech_threshold,
-            hallucination_silence_threshold=hallucination_silence_threshold,
-            condition_on_previous_text=condition_on_previous_text
-        )
+            file, file_ext=file_ext, **settings.model_dump())
 
         return result
+    except HTTPException:
+        raise
+    except ServerBusyError as e:
+        raise server_busy(e)
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Transcription error: {str(e)}")
+
+
+def sse_event(event: str, data) -> str:
+    """Format a Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
+
+
+@app.post("/transcribe/stream/", tags=["transcription"])
+async def transcribe_file_stream(
+    file: UploadFile = File(...),
+    settings: TranscriptionRequest = Depends(transcription_settings)
+):
+    """
+    Transcribe an audio file, reporting progress as Server-Sent Events.
+
+    Emits `status` events while queued and transcribing, one `segment`
+    event per segment, then a `done` event with the remaining result
+    fields, or an `error` event. mlx_whisper has no per-segment callback,
+    so segments are sent as soon as decoding finishes.
+    """
+    file_ext = validate_upload(file)
+
+    # Once the stream starts the status is committed as 200, so a full
+    # queue is reported as a real 429 here. A request that loses the race
+    # for the last place still gets an in-band error event.
+    try:
+        ensure_queue_capacity()
+    except ServerBusyError as e:
+        raise server_busy(e)
+
+    # The upload is closed once this handler returns, so save it before
+    # handing off to the stream
+    try:
+        temp_file_path, digest = await spool_upload(file, file_ext)
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    started = asyncio.Event()
+
+    def finish_job(task):
+        STREAM_JOBS.discard(task)
+        # transcribe_spooled_audio removes the file itself, but a job
+        # cancelled before its first step never gets to run that cleanup
+        if os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
+
+    # The slot is held by this task, not by the response, so it stays
+    # taken until MLX is done even if the client goes away
+    task = asyncio.ensure_future(transcribe_spooled_audio(
+        temp_file_path, digest, file_ext=file_ext, started=started,
+        **settings.model_dump()))
+    STREAM_JOBS.add(task)
+    task.add_done_callback(finish_job)
+
+    def abandon_if_queued():
+        # A job still waiting for its slot can be dropped safely; one that
+        # has started runs to completion on the worker
+        if not started.is_set():
+            task.cancel()
+
+    async def events():
+        started_waiter = asyncio.ensure_future(started.wait())
+        try:
+            yield sse_event("status", {"status": "queued"})
+            pending = {task, started_waiter}
+            while not task.done():
+                done, _ = await asyncio.wait(
+                    pending, timeout=SSE_HEARTBEAT_INTERVAL,
+                    return_when=asyncio.FIRST_COMPLETED)
+                if started_waiter in done:
+                    pending.discard(started_waiter)
+                    yield sse_event("status", {"status": "transcribing"})
+                elif not done:
+                    # Keep proxies from timing out the connection while MLX works
+                    yield ": keep-alive\n\n"
+            result = task.result()
+
+            for segment in result.segments or []:
+                yield sse_event("segment", segment.model_dump())
+            yield sse_event("done", result.model_dump(exclude={"segments"}))
+        except ServerBusyError as e:
+            yield sse_event("error", {"status_code": 429, "detail": str(e)})
+        except Exception as e:
+            yield sse_event("error", {"status_code": 500, "detail": f"Transcription error: {str(e)}"})
+        finally:
+            started_waiter.cancel()
+            abandon_if_queued()
+
+    # Also drop a still-queued job if the response ends without the
+    # stream's finally having run
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             background=BackgroundTask(abandon_if_queued))
+
+
+@app.post("/transcribe_batch/", response_model=BatchTranscriptionResponse, tags=["transcription"])
+async def transcribe_batch(
+    files: List[UploadFile] = File(...),
+    settings: TranscriptionRequest = Depends(transcription_settings)
+):
+    """
+    Transcribe several audio files in one request using MLX Whisper.
+
+    Results are returned in the same order as the uploaded files.
+    """
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many files (max {MAX_BATCH_FILES} per batch)")
+    uploads = [(file, validate_upload(file)) for file in files]
+
+    try:
+        # Files run back to back on the resident model, each taking a slot
+        # only for its own MLX call
+        results = await transcribe_batch_audio(
+            uploads, **settings.model_dump())
+
+        return {"results": results}
+    except HTTPException:
+        raise
+    except ServerBusyError as e:
+        raise server_busy(e)
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Transcription error: {str(e)}")
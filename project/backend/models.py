@@ -1,9 +1,10 @@
 #backend/models.py
-from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from pydantic import BaseModel, ConfigDict
+from typing import Optional, List
 
 
 class TranscriptionRequest(BaseModel):
+    model: Optional[str] = None
     language: Optional[str] = None
     word_timestamps: bool = False
     fp16: bool = True
@@ -13,7 +14,40 @@ class TranscriptionRequest(BaseModel):
     condition_on_previous_text: bool = True
 
 
+class Word(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    word: str
+    start: float
+    end: float
+    probability: Optional[float] = None
+
+
+class Segment(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    id: Optional[int] = None
+    seek: Optional[int] = None
+    start: float
+    end: float
+    text: str
+    tokens: Optional[List[int]] = None
+    temperature: Optional[float] = None
+    avg_logprob: Optional[float] = None
+    compression_ratio: Optional[float] = None
+    no_speech_prob: Optional[float] = None
+    words: Optional[List[Word]] = None
+
+
 class TranscriptionResponse(BaseModel):
     text: str
     language: str
-    segments: Optional[List[Dict[str, Any]]] = None
+    segments: Optional[List[Segment]] = None
+    # Word-level timings flattened across all segments, as parallel columns
+    word_texts: Optional[List[str]] = None
+    word_starts: Optional[List[float]] = None
+    word_ends: Optional[List[float]] = None
+
+
+class BatchTranscriptionResponse(BaseModel):
+    results: List[TranscriptionResponse]
@@ -6,6 +6,7 @@ Tests transcription functionality by sending an audio file to the backend.
 import os
 import sys
 import requests
+from requests_toolbelt.multipart.encoder import MultipartEncoder
 from pathlib import Path
 import argparse
 import json
@@ -38,20 +39,24 @@ def test_transcribe(audio_file_path: str, api_url: str = "http://localhost:8000"
     print(f"Sending file {file_path} to {url}...")
 
     try:
-        # Create form data
-        files = {"file": (file_path.name, open(
-            file_path, "rb"), f"audio/{file_path.suffix[1:]}")}
+        # Create form data; the file is streamed from disk in chunks
+        # instead of being read into memory up front
         data = {
-            "language": None,  # Auto-detect language
             "word_timestamps": "true",
             "fp16": "true",
             "best_of": "5",
             "no_speech_threshold": "0.6",
             "condition_on_previous_text": "true"
-        }
+        }  # "language" is omitted to auto-detect
 
-        # Send request
-        response = requests.post(url, files=files, data=data)
+        with open(file_path, "rb") as audio_file:
+            data["file"] = (file_path.name, audio_file,
+                            f"audio/{file_path.suffix[1:]}")
+            encoder = MultipartEncoder(fields=data)
+
+            # Send request
+            response = requests.post(
+                url, data=encoder, headers={"Content-Type": encoder.content_type})
 
         # Process response
         if response.status_code == 200:
@@ -1,43 +1,304 @@
 #backend/utils.py
 import os
+import json
+import asyncio
+import functools
 import tempfile
-import mlx_whisper
+from contextlib import asynccontextmanager
+from typing import List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import aiofiles.tempfile
+from blake3 import blake3
+from diskcache import Cache
+from fastapi import UploadFile
+from models import TranscriptionResponse
 
+# mlx, mlx_whisper and soundfile are imported lazily inside the functions
+# that need them, so the API can start serving before they are loaded
 
-async def transcribe_audio(
-    file_content: bytes,
+# Whisper models a request may select, mapped to their Hugging Face repos
+AVAILABLE_MODELS = {
+    "whisper-tiny": "mlx-community/whisper-tiny-mlx",
+    "whisper-base": "mlx-community/whisper-base-mlx",
+    "whisper-small": "mlx-community/whisper-small-mlx",
+    "whisper-medium": "mlx-community/whisper-medium-mlx",
+    "whisper-large-v3": "mlx-community/whisper-large-v3-mlx",
+    # 4-bit weights: roughly half the memory traffic per decode step
+    "whisper-large-v3-4bit": "mlx-community/whisper-large-v3-mlx-4bit",
+}
+
+# Repo used when a request does not pick a model (preloaded at startup)
+MODEL_REPO = os.getenv("WHISPER_MODEL", AVAILABLE_MODELS["whisper-large-v3-4bit"])
+
+# Maximum accepted upload size (100MB)
+MAX_FILE_SIZE = 100 * 1024 * 1024
+# Size of the chunks read from an upload while spooling it to disk (1MB)
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# Transcription results are cached on disk, keyed by audio content and settings
+CACHE_DIR = os.getenv(
+    "TRANSCRIPTION_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "mlx-whisper-cache"))
+CACHE_TTL = 24 * 60 * 60  # seconds
+_CACHE = Cache(CACHE_DIR)
+
+# Directory for spooled uploads; point it at a RAM disk to keep uploads off
+# the physical disk. None uses the system default temp dir.
+TEMP_DIR = os.getenv("TRANSCRIBE_TMPDIR") or None
+
+# Formats libsndfile decodes natively; anything else is decoded by ffmpeg
+SOUNDFILE_EXTENSIONS = {".wav", ".flac"}
+
+# MLX runs on a single GPU, so one worker serializes model work while
+# keeping the event loop free for other requests
+_EXECUTOR = ThreadPoolExecutor(max_workers=1)
+
+# Admission control in front of MLX: how many transcriptions may run at once
+# and how many more may wait before new requests are turned away
+MLX_CONCURRENCY = int(os.getenv("MLX_CONCURRENCY", "1"))
+MAX_QUEUE = int(os.getenv("MLX_MAX_QUEUE", "4"))
+_TRANSCRIBE_SEM = asyncio.Semaphore(MLX_CONCURRENCY)
+# Transcriptions currently running on MLX or waiting for the semaphore
+_queue_depth = 0
+
+
+def _load_model(path_or_hf_repo: str, fp16: bool):
+    """Load the model into mlx_whisper's cache and warm up Metal."""
+    import mlx.core as mx
+    from mlx_whisper.transcribe import ModelHolder
+
+    dtype = mx.float16 if fp16 else mx.float32
+    model = ModelHolder.get_model(path_or_hf_repo, dtype)
+    # Evaluate a trivial op once so Metal initialisation happens up front
+    mx.eval(mx.zeros((1,)))
+    return model
+
+
+async def preload_model(path_or_hf_repo: str = MODEL_REPO, fp16: bool = True):
+    """
+    Load the Whisper model once so requests reuse the resident weights.
+
+    mlx_whisper.transcribe resolves its model through ModelHolder, so
+    populating that cache at startup means the first request no longer
+    pays the load cost. The load runs on the transcription worker thread.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _EXECUTOR, _load_model, path_or_hf_repo, fp16)
+
+
+def _load_audio(path: str, file_ext: str):
+    """
+    Decode audio in-process when possible to skip the ffmpeg subprocess.
+
+    Returns a mono float32 waveform for WAV/FLAC files already sampled at
+    16kHz, and the path otherwise (or when soundfile isn't installed) so
+    mlx_whisper decodes it via ffmpeg.
+    """
+    if file_ext not in SOUNDFILE_EXTENSIONS:
+        return path
+    try:
+        import soundfile as sf
+    except ImportError:
+        # soundfile is an optional fast path; ffmpeg handles everything
+        return path
+    from mlx_whisper.audio import SAMPLE_RATE
+
+    if sf.info(path).samplerate != SAMPLE_RATE:
+        return path
+
+    audio, _ = sf.read(path, dtype="float32", always_2d=False)
+    if audio.ndim > 1:
+        # Downmix to mono the same way ffmpeg's -ac 1 would
+        audio = audio.mean(axis=1, dtype="float32")
+    return audio
+
+
+def _transcribe(path: str, file_ext: str, **options):
+    """Decode and transcribe an audio file (runs on the worker thread)."""
+    import mlx_whisper
+
+    return mlx_whisper.transcribe(_load_audio(path, file_ext), **options)
+
+
+def build_response(result: dict) -> TranscriptionResponse:
+    """Build a typed TranscriptionResponse from an mlx_whisper result."""
+    return TranscriptionResponse.model_validate(add_word_columns(result))
+
+
+def add_word_columns(result: dict) -> dict:
+    """
+    Flatten per-segment word timings into parallel word_texts,
+    word_starts and word_ends lists on the result.
+
+    Leaves the result untouched when word timestamps were not generated.
+    """
+    words = [word for segment in result.get("segments") or []
+             for word in segment.get("words", [])]
+    if words:
+        result["word_texts"] = [word["word"] for word in words]
+        result["word_starts"] = [word["start"] for word in words]
+        result["word_ends"] = [word["end"] for word in words]
+    return result
+
+
+class FileTooLargeError(Exception):
+    """Raised when an upload grows past MAX_FILE_SIZE while being saved."""
+
+
+class ServerBusyError(Exception):
+    """Raised when too many transcriptions are already waiting for MLX."""
+
+
+def ensure_queue_capacity():
+    """Raise ServerBusyError if no more transcriptions may be queued."""
+    if _queue_depth >= MLX_CONCURRENCY + MAX_QUEUE:
+        raise ServerBusyError("Server busy: too many transcriptions queued")
+
+
+@asynccontextmanager
+async def transcription_slot():
+    """
+    Wait for a free MLX slot, or fail with ServerBusyError if too many
+    transcriptions are already waiting.
+    """
+    global _queue_depth
+
+    ensure_queue_capacity()
+    _queue_depth += 1
+    try:
+        async with _TRANSCRIBE_SEM:
+            yield
+    finally:
+        _queue_depth -= 1
+
+
+async def save_upload(upload: UploadFile, out_file, max_size: int = MAX_FILE_SIZE):
+    """
+    Stream an uploaded file into an open aiofiles binary file in
+    fixed-size chunks.
+
+    Aborts with FileTooLargeError as soon as more than max_size bytes
+    have been received, instead of buffering the whole upload first.
+    Returns the BLAKE3 hex digest of the content.
+    """
+    total = 0
+    # BLAKE3 hashes with SIMD (NEON/AVX2) and outruns SHA-256 on large uploads
+    digest = blake3()
+    while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+        total += len(chunk)
+        if total > max_size:
+            raise FileTooLargeError(
+                f"File too large (max {max_size // (1024 * 1024)}MB)")
+        digest.update(chunk)
+        await out_file.write(chunk)
+    return digest.hexdigest()
+
+
+def _cache_key(digest: str, options: dict) -> str:
+    """Build a result cache key from the audio digest and decode options."""
+    # json (not hash()) keeps the key stable across processes
+    return f"{digest}:{json.dumps(options, sort_keys=True)}"
+
+
+async def spool_upload(upload: UploadFile, file_ext: str):
+    """
+    Save an upload to a temporary file.
+
+    Returns (temp_file_path, digest). The caller owns the file; it is
+    removed by transcribe_spooled_audio.
+    """
+    temp_file_path = None
+    try:
+        # aiofiles runs the disk writes in a thread so they don't block the
+        # event loop
+        async with aiofiles.tempfile.NamedTemporaryFile(
+                "wb", delete=False, suffix=file_ext, dir=TEMP_DIR) as temp_file:
+            temp_file_path = temp_file.name
+            digest = await save_upload(upload, temp_file)
+    except BaseException:
+        if temp_file_path and os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
+        raise
+    return temp_file_path, digest
+
+
+async def transcribe_spooled_audio(
+    temp_file_path: str,
+    digest: str,
+    file_ext: str = ".mp3",
+    model: str = None,
     language: str = None,
     word_timestamps: bool = False,
     fp16: bool = True,
     best_of: int = 5,
     no_speech_threshold: float = 0.6,
     hallucination_silence_threshold: float = None,
-    condition_on_previous_text: bool = True
+    condition_on_previous_text: bool = True,
+    started: Optional[asyncio.Event] = None
 ):
     """
-    Transcribe audio using MLX Whisper
+    Transcribe an audio file saved by spool_upload, then delete it.
+
+    model is a key of AVAILABLE_MODELS; None uses MODEL_REPO. Only the MLX
+    call holds a transcription slot, so cache hits never queue; started,
+    if given, is set once that slot is acquired.
     """
-    # Create a temporary file to store the uploaded audio
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as temp_file:
-        temp_file.write(file_content)
-        temp_file_path = temp_file.name
+    options = dict(
+        path_or_hf_repo=AVAILABLE_MODELS[model] if model else MODEL_REPO,
+        language=language,
+        word_timestamps=word_timestamps,
+        fp16=fp16,
+        best_of=best_of,
+        no_speech_threshold=no_speech_threshold,
+        hallucination_silence_threshold=hallucination_silence_threshold,
+        condition_on_previous_text=condition_on_previous_text
+    )
 
     try:
-        # Process with MLX Whisper
-        result = mlx_whisper.transcribe(
-            temp_file_path,
-            path_or_hf_repo="mlx-community/whisper-large-v3-mlx",
-            language=language,
-            word_timestamps=word_timestamps,
-            fp16=fp16,
-            best_of=best_of,
-            no_speech_threshold=no_speech_threshold,
-            hallucination_silence_threshold=hallucination_silence_threshold,
-            condition_on_previous_text=condition_on_previous_text
-        )
-
-        return result
+        # Return the stored result if this audio was already transcribed
+        # with the same settings. Cache reads and writes pickle large dicts
+        # and touch SQLite, so they run in a thread of their own rather
+        # than on the event loop or behind MLX on _EXECUTOR
+        cache_key = _cache_key(digest, options)
+        result = await asyncio.to_thread(_CACHE.get, cache_key)
+        if result is not None:
+            return build_response(result)
+
+        # Process with MLX Whisper off the event loop
+        loop = asyncio.get_running_loop()
+        async with transcription_slot():
+            if started is not None:
+                started.set()
+            result = await loop.run_in_executor(_EXECUTOR, functools.partial(
+                _transcribe, temp_file_path, file_ext, **options))
+
+        await asyncio.to_thread(_CACHE.set, cache_key, result, expire=CACHE_TTL)
+        return build_response(result)
     finally:
         # Clean up the temporary file
         if os.path.exists(temp_file_path):
             os.remove(temp_file_path)
+
+
+async def transcribe_audio(upload: UploadFile, file_ext: str = ".mp3", **settings):
+    """
+    Transcribe an uploaded audio file using MLX Whisper
+    """
+    temp_file_path, digest = await spool_upload(upload, file_ext)
+    return await transcribe_spooled_audio(
+        temp_file_path, digest, file_ext=file_ext, **settings)
+
+
+async def transcribe_batch_audio(uploads: List[Tuple[UploadFile, str]], **options):
+    """
+    Transcribe several uploaded audio files with the same settings.
+
+    Takes (upload, file_ext) pairs. mlx_whisper has no batched decode, so
+    the files are transcribed one after another on the resident model;
+    each still goes through the result cache.
+    """
+    results = []
+    for upload, file_ext in uploads:
+        results.append(await transcribe_audio(upload, file_ext=file_ext, **options))
+    return results
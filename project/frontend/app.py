@@ -1,16 +1,20 @@
 # frontend/app.py
 import streamlit as st
+import numpy as np
+import pandas as pd
 import requests
-import time
-import json
-from io import BytesIO
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from requests_toolbelt.multipart.encoder import MultipartEncoder, MultipartEncoderMonitor
+import orjson
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import logging  # Optional: for better debugging
 # Import utility functions for timestamp formatting
 from utils import (
     format_time,
-    format_srt_time,
-    format_timestamps_as_subtitles,
-    generate_srt_content
+    render_subtitles
 )
 
 # Configure logging (optional)
@@ -20,17 +24,25 @@ logger = logging.getLogger(__name__)
 
 # Define the FastAPI backend URL
 API_URL = "http://localhost:8000"  # Ensure this points to your running backend
+# How many files are sent to the backend at once when several are uploaded
+MAX_PARALLEL_UPLOADS = 4
+# Per-result renders are cached for every session and each result gets a
+# fresh key, so they are bounded in count and lifetime. They are never
+# mutated, so st.cache_resource hands back the same objects instead of
+# st.cache_data's pickled copy on every rerun
+RENDER_CACHE_ENTRIES = 32
+RENDER_CACHE_TTL = 3600  # seconds
 
 # Initialize session state variables
 if 'transcription_state' not in st.session_state:
     # idle, running, cancelled, success, error
     st.session_state.transcription_state = "idle"
-if 'result' not in st.session_state:
-    st.session_state.result = None
+if 'results' not in st.session_state:
+    st.session_state.results = []  # One entry per transcribed file
 if 'error_message' not in st.session_state:
     st.session_state.error_message = None
-if 'uploaded_file_info' not in st.session_state:
-    st.session_state.uploaded_file_info = None  # To store name/type if needed
+if 'uploaded_files_info' not in st.session_state:
+    st.session_state.uploaded_files_info = None  # Name/size/type of each file
 
 # --- Helper Functions ---
 
@@ -38,49 +50,395 @@ if 'uploaded_file_info' not in st.session_state:
 def reset_state():
     """Resets the transcription state."""
     st.session_state.transcription_state = "idle"
-    st.session_state.result = None
+    st.session_state.results = []
     st.session_state.error_message = None
-    # Keep uploaded_file_info unless a new file is uploaded
-
-
-def request_transcription(uploaded_file_obj, settings):
-    """Sends the transcription request to the backend."""
-    files = {"file": (uploaded_file_obj.name,
-                      uploaded_file_obj, uploaded_file_obj.type)}
+    # Keep uploaded_files_info unless new files are uploaded
+
+
+@st.cache_resource(show_spinner=False, max_entries=RENDER_CACHE_ENTRIES, ttl=RENDER_CACHE_TTL)
+def cached_subtitles(result_key, _result):
+    """(subtitle lines, SRT content) for a result, rendered once per result_key."""
+    # The leading underscore keeps Streamlit from hashing the whole result
+    return render_subtitles(_result)
+
+
+@st.cache_resource(show_spinner=False, max_entries=RENDER_CACHE_ENTRIES, ttl=RENDER_CACHE_TTL)
+def cached_words_frame(result_key, _result):
+    """
+    One DataFrame of every word's timings, built once per result_key.
+    The frame is shared, not copied, so callers must not modify it.
+    """
+    # Segment number of each word, in the same order the backend flattened them
+    word_segments = np.repeat(
+        np.arange(1, len(_result["segments"]) + 1),
+        [len(segment.get("words") or []) for segment in _result["segments"]])
+    return pd.DataFrame({
+        "Segment": word_segments,
+        "Word": _result["word_texts"],
+        "Start": _result["word_starts"],
+        "End": _result["word_ends"]
+    })
+
+
+@st.cache_resource(show_spinner=False, max_entries=RENDER_CACHE_ENTRIES, ttl=RENDER_CACHE_TTL)
+def cached_json_bytes(result_key, _result):
+    """Pretty-printed JSON bytes for a result, encoded once per result_key."""
+    return orjson.dumps(_result, option=orjson.OPT_INDENT_2)
+
+
+def create_session():
+    """Builds a requests.Session configured for the backend."""
+    session = requests.Session()
+    # Connection errors are retried; POSTs are never re-sent after the
+    # body has gone out
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8,
+                          max_retries=Retry(total=2, backoff_factor=0.3))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    # Ask for compressed responses; requests decompresses them transparently
+    session.headers.update({"Accept": "application/json",
+                            "Accept-Encoding": "gzip, deflate"})
+    return session
+
+
+@st.cache_resource
+def get_session():
+    """
+    Returns a requests.Session shared across reruns, so transcriptions
+    reuse keep-alive connections to the backend. Only the script thread
+    uses it; upload workers get their own from worker_session().
+    """
+    return create_session()
+
+
+# requests doesn't promise that a Session is thread-safe, so each upload
+# worker thread keeps one of its own
+_worker_state = threading.local()
+
+
+def worker_session():
+    """Returns the calling worker thread's own session."""
+    if not hasattr(_worker_state, "session"):
+        _worker_state.session = create_session()
+    return _worker_state.session
+
+
+def upload_progress_callback(progress_bar):
+    """
+    Returns a MultipartEncoderMonitor callback that drives progress_bar
+    from the bytes actually sent to the backend.
+    """
+    last_percent = -1
+
+    def callback(monitor):
+        nonlocal last_percent
+        percent = monitor.bytes_read * 100 // monitor.len
+        # The monitor fires per chunk; only redraw when the percentage moves
+        if percent == last_percent:
+            return
+        last_percent = percent
+        if percent < 100:
+            progress_bar.progress(percent, text=f"Uploading audio... {percent}%")
+        else:
+            progress_bar.progress(100, text="Transcribing audio... Please wait.")
+
+    return callback
+
+
+def iter_sse_events(response):
+    """Yields (event, data) pairs from a streamed text/event-stream response."""
+    event, data_lines = "message", []
+    # chunk_size=None hands over bytes as soon as they arrive
+    for line in response.iter_lines(chunk_size=None):
+        if not line:
+            # A blank line ends the event
+            if data_lines:
+                yield event, orjson.loads(b"\n".join(data_lines))
+            event, data_lines = "message", []
+        elif line.startswith(b":"):
+            continue  # Keep-alive comment
+        elif line.startswith(b"event:"):
+            event = line[len(b"event:"):].strip().decode()
+        elif line.startswith(b"data:"):
+            data_lines.append(line[len(b"data:"):].lstrip())
+
+
+def read_transcription_stream(response, progress_bar=None, segment_preview=None):
+    """
+    Consumes the backend's transcription event stream, showing segments in
+    segment_preview as they arrive. Returns the assembled result, or None
+    after recording the error in session state.
+    """
+    segments = []
+    for event, data in iter_sse_events(response):
+        if event == "status" and progress_bar is not None:
+            if data.get("status") == "queued":
+                progress_bar.progress(100, text="Waiting for the transcription server...")
+            else:
+                progress_bar.progress(100, text="Transcribing audio... Please wait.")
+        elif event == "segment":
+            segments.append(data)
+            if segment_preview is not None:
+                segment_preview.caption(
+                    f"[{format_time(data['start'])}] {data['text'].strip()}")
+        elif event == "done":
+            data["segments"] = segments
+            return data
+        elif event == "error":
+            logger.error(f"Transcription failed: {data}")
+            st.session_state.error_message = f"Failed to communicate with the transcription server. Error {data.get('status_code')}: {data.get('detail')}"
+            st.session_state.transcription_state = "error"
+            return None
+
+    # The stream ended without a final event
+    st.session_state.error_message = "The transcription server closed the connection before finishing."
+    st.session_state.transcription_state = "error"
+    return None
+
+
+def build_multipart(uploaded_file_obj, settings):
+    """Builds a streaming multipart body for one file and its settings."""
     form_data = {k: str(v).lower() if isinstance(v, bool) else str(v)
                  for k, v in settings.items() if v is not None}
+    # Stream the multipart body from the file object instead of building
+    # the whole request in memory first
+    uploaded_file_obj.seek(0)
+    form_data["file"] = (uploaded_file_obj.name,
+                         uploaded_file_obj, uploaded_file_obj.type)
+    return MultipartEncoder(fields=form_data)
+
+
+def describe_request_error(error):
+    """Turns a failed backend request into a user-facing error message."""
+    if isinstance(error, requests.exceptions.Timeout):
+        return "The transcription request timed out. The file might be too long or the server busy."
+    if isinstance(error, requests.exceptions.RequestException):
+        error_detail = f"Error: {error}"
+        response = error.response
+        if response is not None:
+            try:
+                # Try to get more specific error from response body if available
+                error_detail = f"Error {response.status_code}: {response.json().get('detail', response.text)}"
+            except Exception:
+                pass  # Keep the original error if response parsing fails
+        return f"Failed to communicate with the transcription server. {error_detail}"
+    return f"An unexpected error occurred: {str(error)}"
+
+
+def make_result_entry(file_name, result=None, error=None):
+    """Bundles one file's result (or error) with a key for the render caches."""
+    return {"name": file_name, "result": result, "error": error,
+            "result_key": uuid.uuid4().hex}
+
+
+def request_transcription(uploaded_file_obj, settings, progress_bar=None, segment_preview=None):
+    """Sends the transcription request to the backend and streams back the result."""
+    encoder = build_multipart(uploaded_file_obj, settings)
+    if progress_bar is not None:
+        encoder = MultipartEncoderMonitor(
+            encoder, upload_progress_callback(progress_bar))
 
     try:
-        response = requests.post(
-            f"{API_URL}/transcribe/",
-            files=files,
-            data=form_data,
-            timeout=1000
-        )
-        response.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
-        return response.json()
-    except requests.exceptions.Timeout:
-        logger.error("Request timed out.")
-        st.session_state.error_message = "The transcription request timed out. The file might be too long or the server busy."
-        st.session_state.transcription_state = "error"
-        return None
-    except requests.exceptions.RequestException as e:
+        # stream=True lets segments be handled as they arrive instead of
+        # buffering the whole body
+        with get_session().post(
+            f"{API_URL}/transcribe/stream/",
+            data=encoder,
+            headers={"Content-Type": encoder.content_type,
+                     "Accept": "text/event-stream"},
+            timeout=1000,
+            stream=True
+        ) as response:
+            if not response.ok:
+                # Load the error body while the streamed connection is open
+                _ = response.content
+            response.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
+            return read_transcription_stream(response, progress_bar, segment_preview)
+    except Exception as e:
         logger.error(f"Request failed: {e}")
-        error_detail = f"Error: {e}"
-        try:
-            # Try to get more specific error from response body if available
-            error_detail = f"Error {response.status_code}: {response.json().get('detail', response.text)}"
-        except Exception:
-            pass  # Keep the original error if response parsing fails
-        st.session_state.error_message = f"Failed to communicate with the transcription server. {error_detail}"
-        st.session_state.transcription_state = "error"
-        return None
-    except Exception as e:  # Catch other potential errors
-        logger.error(f"An unexpected error occurred: {e}")
-        st.session_state.error_message = f"An unexpected error occurred: {str(e)}"
+        st.session_state.error_message = describe_request_error(e)
         st.session_state.transcription_state = "error"
         return None
 
+
+def post_transcription(uploaded_file_obj, settings):
+    """
+    Transcribes one file through the non-streaming endpoint. Makes no
+    Streamlit calls, so it is safe to run on a worker thread.
+    """
+    encoder = build_multipart(uploaded_file_obj, settings)
+    response = worker_session().post(
+        f"{API_URL}/transcribe/",
+        data=encoder,
+        headers={"Content-Type": encoder.content_type},
+        timeout=1000
+    )
+    response.raise_for_status()
+    return orjson.loads(response.content)
+
+
+def transcribe_files_in_parallel(uploaded_files, settings, progress_bar):
+    """
+    Transcribes several files concurrently, one session per worker thread.
+
+    Returns one result entry per file, in upload order; a failed file gets
+    an entry with its error message instead of failing the whole run.
+    """
+    entries = [None] * len(uploaded_files)
+    executor = ThreadPoolExecutor(max_workers=MAX_PARALLEL_UPLOADS)
+    try:
+        futures = {executor.submit(post_transcription, file, settings): i
+                   for i, file in enumerate(uploaded_files)}
+        # Streamlit calls stay on the script thread; workers only do HTTP
+        for finished, future in enumerate(as_completed(futures), 1):
+            i = futures[future]
+            try:
+                entries[i] = make_result_entry(
+                    uploaded_files[i].name, result=future.result())
+            except Exception as e:
+                logger.error(f"Request for {uploaded_files[i].name} failed: {e}")
+                entries[i] = make_result_entry(
+                    uploaded_files[i].name, error=describe_request_error(e))
+            progress_bar.progress(
+                finished / len(uploaded_files),
+                text=f"Transcribed {finished} of {len(uploaded_files)} files...")
+    finally:
+        # If Streamlit stops the script (a widget change, Stop, a new
+        # upload) don't block until every upload finishes only to discard
+        # the results; queued files are dropped
+        executor.shutdown(wait=False, cancel_futures=True)
+    return entries
+
+
+def render_result(entry, word_timestamps_requested):
+    """Renders one file's transcription with its tabs and download buttons."""
+    if entry["error"]:
+        st.error(f"An error occurred: {entry['error']}")
+        return
+
+    result = entry["result"]
+    result_key = entry["result_key"]
+    # Base name for every download, computed once per rerun
+    stem = entry["name"].rsplit('.', 1)[0]
+
+    # Format the segments once; the tabs and download buttons below
+    # all reuse these
+    formatted_lines, srt_content = cached_subtitles(result_key, result)
+    srt_bytes = srt_content.encode("utf-8") if srt_content else None
+
+    st.subheader("Transcription Text")
+    st.markdown(
+        f'<div class="result-area">{result["text"]}</div>', unsafe_allow_html=True)
+
+    detected_language = result.get("language", "unknown")
+    st.info(f"Detected language: {detected_language}")
+
+    # Add formatted timestamps displays
+    if "segments" in result and result["segments"]:
+        # Create tabs for different timestamp formats
+        tab1, tab2, tab3 = st.tabs(
+            ["Subtitle Format", "SRT Format", "Word Timestamps"])
+
+        with tab1:
+            # Custom subtitle format
+            if formatted_lines:
+                formatted_text = "\n".join(formatted_lines)
+                st.text_area("Subtitle Format",
+                             formatted_text, height=300,
+                             key=f"subtitle_text_{result_key}")
+
+                subtitle_bytes = formatted_text.encode("utf-8")
+                st.download_button(
+                    label="Download Formatted Timestamps",
+                    data=subtitle_bytes,
+                    file_name=f"{stem}_subtitles.txt",
+                    key=f"subtitle_download_{result_key}",
+                    mime="text/plain",
+                    use_container_width=True
+                )
+            else:
+                st.warning(
+                    "No segment data available to format timestamps.")
+
+        with tab2:
+            # SRT format
+            if srt_content:
+                st.text_area("SRT Format", srt_content, height=300,
+                             key=f"srt_text_{result_key}")
+
+                st.download_button(
+                    label="Download SRT Subtitle File",
+                    data=srt_bytes,
+                    file_name=f"{stem}.srt",
+                    key=f"srt_download_{result_key}",
+                    mime="text/plain",
+                    use_container_width=True
+                )
+            else:
+                st.warning(
+                    "No segment data available to generate SRT file.")
+
+        with tab3:
+            # Original word timestamps (only show if word_timestamps was requested)
+            if word_timestamps_requested and "segments" in result and result["segments"]:
+                # Word timings arrive as parallel columns, so the
+                # table is built in one shot without per-word dicts
+                if result.get("word_texts"):
+                    words_df = cached_words_frame(result_key, result)
+                    st.dataframe(
+                        words_df,
+                        column_config={
+                            "Start": st.column_config.NumberColumn(format="%.2fs"),
+                            "End": st.column_config.NumberColumn(format="%.2fs")
+                        },
+                        use_container_width=True
+                    )
+                else:
+                    st.caption(
+                        "Word timestamps were requested but not generated by the model for this audio.")
+            else:
+                st.info(
+                    "Word-level timestamps were not requested in the transcription settings.")
+
+    # Download Buttons section - expanded with columns for all download options
+    col_dl1, col_dl2, col_dl3 = st.columns(3)
+    with col_dl1:
+        transcript_bytes = result["text"].encode("utf-8")
+        st.download_button(
+            label="Download Transcript (.txt)",
+            data=transcript_bytes,
+            file_name=f"{stem}_transcript.txt",
+            key=f"transcript_download_{result_key}",
+            mime="text/plain",
+            use_container_width=True
+        )
+
+    # Add SRT download in the second column
+    if "segments" in result and result["segments"]:
+        with col_dl2:
+            if srt_content:
+                st.download_button(
+                    label="Download SRT Subtitles",
+                    data=srt_bytes,
+                    file_name=f"{stem}.srt",
+                    key=f"srt_download_col_{result_key}",
+                    mime="text/plain",
+                    use_container_width=True
+                )
+
+    # Keep JSON download in the third column
+    if word_timestamps_requested and "segments" in result and result["segments"] and result["segments"][0] and "words" in result["segments"][0]:
+        with col_dl3:
+            json_bytes = cached_json_bytes(result_key, result)
+            st.download_button(
+                label="Download Full JSON",
+                data=json_bytes,
+                file_name=f"{stem}_full_transcript.json",
+                key=f"json_download_{result_key}",
+                mime="application/json",
+                use_container_width=True
+            )
+
 # --- UI Rendering ---
 
 
@@ -96,58 +454,69 @@ with st.sidebar:
     # Disable settings while processing
     is_running = st.session_state.transcription_state == "running"
 
-    model = st.selectbox(
-        "Model",
-        ["whisper-tiny", "whisper-base", "whisper-small",
-            "whisper-medium", "whisper-large-v3"],
-        index=4,
-        help="Select the Whisper model to use for transcription",
-        disabled=is_running
-    )
-    language = st.selectbox(
-        "Language",
-        [None, "en", "fr", "de", "es", "it", "pt",
-            "nl", "ru", "zh", "ja", "ko", "ar"],
-        index=0,
-        format_func=lambda x: "Auto-detect" if x is None else x,
-        help="Select the language of the audio (optional)",
-        disabled=is_running
-    )
-
-    with st.expander("Advanced Options"):
-        word_timestamps = st.toggle(
-            "Word Timestamps", value=True, help="Generate timestamps for each word",
+    # Widgets inside a form don't rerun the script as they change; the
+    # whole set is applied in one rerun when the form is submitted
+    with st.form("settings"):
+        # None sends no model, so the backend uses its default
+        # (WHISPER_MODEL), which is the model it preloads at startup
+        model = st.selectbox(
+            "Model",
+            [None, "whisper-tiny", "whisper-base", "whisper-small",
+                "whisper-medium", "whisper-large-v3", "whisper-large-v3-4bit"],
+            index=0,
+            format_func=lambda x: "Server default" if x is None else x,
+            help="Select the Whisper model to use for transcription",
             disabled=is_running
         )
-        fp16 = st.toggle("Use FP16", value=True,
-                         help="Use half-precision floating point (faster)",
-                         disabled=is_running)
-        best_of = st.slider("Best Of", min_value=1, max_value=50,
-                            value=5, help="Number of candidates to generate",
-                            disabled=is_running)
-        no_speech_threshold = st.slider(
-            "No Speech Threshold", min_value=0.0, max_value=1.0, value=0.6, step=0.01,
-            help="Threshold for classifying audio as speech",
+        language = st.selectbox(
+            "Language",
+            [None, "en", "fr", "de", "es", "it", "pt",
+                "nl", "ru", "zh", "ja", "ko", "ar"],
+            index=0,
+            format_func=lambda x: "Auto-detect" if x is None else x,
+            help="Select the language of the audio (optional)",
             disabled=is_running
         )
-        # Simplified Hallucination filter toggle
-        enable_hallucination_filter = st.toggle(
-            "Enable Hallucination Filter", value=True, disabled=is_running
-        )
-        hallucination_threshold = st.slider(
-            "Hallucination Silence Threshold", min_value=0.0, max_value=1.0, value=0.1, step=0.01,
-            help="Threshold for filtering out hallucinations (active if filter is enabled)",
-            disabled=is_running or not enable_hallucination_filter
-        )
-        # Use the slider value only if the toggle is on
-        effective_hallucination_threshold = hallucination_threshold if enable_hallucination_filter else None
 
-        condition_on_previous_text = st.toggle(
-            "Condition on Previous Text", value=True, disabled=is_running
-        )
-
-    # Store current settings in a dictionary
-    transcription_settings = {
+        with st.expander("Advanced Options"):
+            word_timestamps = st.toggle(
+                "Word Timestamps", value=True, help="Generate timestamps for each word",
+                disabled=is_running
+            )
+            fp16 = st.toggle("Use FP16", value=True,
+                             help="Use half-precision floating point (faster)",
+                             disabled=is_running)
+            best_of = st.slider("Best Of", min_value=1, max_value=50,
+                                value=5, help="Number of candidates to generate",
+                                disabled=is_running)
+            no_speech_threshold = st.slider(
+                "No Speech Threshold", min_value=0.0, max_value=1.0, value=0.6, step=0.01,
+                help="Threshold for classifying audio as speech",
+                disabled=is_running
+            )
+            # Simplified Hallucination filter toggle
+            enable_hallucination_filter = st.toggle(
+                "Enable Hallucination Filter", value=True, disabled=is_running
+            )
+            hallucination_threshold = st.slider(
+                "Hallucination Silence Threshold", min_value=0.0, max_value=1.0, value=0.1, step=0.01,
+                help="Threshold for filtering out hallucinations (active if filter is enabled)",
+                disabled=is_running
+            )
+            condition_on_previous_text = st.toggle(
+                "Condition on Previous Text", value=True, disabled=is_running
+            )
+
+        submitted = st.form_submit_button(
+            "Apply", use_container_width=True, disabled=is_running)
+
+# Store the applied settings; until the form is first submitted the
+# widget defaults are used
+if submitted or 'transcription_settings' not in st.session_state:
+    # Use the slider value only if the toggle is on
+    effective_hallucination_threshold = hallucination_threshold if enable_hallucination_filter else None
+    st.session_state.transcription_settings = {
+        "model": model,
         "language": language,
         "word_timestamps": word_timestamps,
         "fp16": fp16,
@@ -156,47 +525,51 @@ with st.sidebar:
         "hallucination_silence_threshold": effective_hallucination_threshold,
         "condition_on_previous_text": condition_on_previous_text
     }
+transcription_settings = st.session_state.transcription_settings
 
 # Main area
-st.subheader("Upload Audio File")
-help_text = "Supported formats: mp3, wav, m4a, flac (max 100MB)"
+st.subheader("Upload Audio Files")
+help_text = "Supported formats: mp3, wav, m4a, flac (max 100MB per file)"
 st.caption(help_text)
 
 # File uploader
-uploaded_file = st.file_uploader(
-    "Choose an audio file",
+uploaded_files = st.file_uploader(
+    "Choose one or more audio files",
     type=["mp3", "wav", "m4a", "flac", "mov"],
+    accept_multiple_files=True,
     disabled=is_running,
-    on_change=reset_state  # Reset if a new file is uploaded
+    on_change=reset_state  # Reset if new files are uploaded
 )
 
 # --- Transcription Logic and Status Display ---
 
-if uploaded_file is not None:
+if uploaded_files:
     # Store file info if not already stored or if it changed
-    if st.session_state.uploaded_file_info is None or \
-       st.session_state.uploaded_file_info['name'] != uploaded_file.name or \
-       st.session_state.uploaded_file_info['size'] != uploaded_file.size:
-        st.session_state.uploaded_file_info = {
-            'name': uploaded_file.name,
-            'size': uploaded_file.size,
-            'type': uploaded_file.type
-        }
-        # Reset state if a truly new file is uploaded
+    files_info = [{'name': f.name, 'size': f.size, 'type': f.type}
+                  for f in uploaded_files]
+    if st.session_state.uploaded_files_info != files_info:
+        st.session_state.uploaded_files_info = files_info
+        # Reset state if truly new files are uploaded
         reset_state()
 
-    # Display audio player
-    st.audio(uploaded_file, format=uploaded_file.type)
+    # Display audio players
+    if len(uploaded_files) == 1:
+        st.audio(uploaded_files[0], format=uploaded_files[0].type)
+    else:
+        with st.expander(f"{len(uploaded_files)} files selected"):
+            for f in uploaded_files:
+                st.caption(f.name)
+                st.audio(f, format=f.type)
 
     # Control buttons and status area
     col1, col2 = st.columns([1, 3])
 
     with col1:
-        # Show Transcribe button only when idle and file is present
+        # Show Transcribe button only when idle and files are present
         if st.session_state.transcription_state == "idle":
             if st.button("Transcribe", type="primary", use_container_width=True):
                 st.session_state.transcription_state = "running"
-                st.session_state.result = None  # Clear previous results
+                st.session_state.results = []  # Clear previous results
                 st.session_state.error_message = None
                 st.rerun()  # Rerun to show the status indicator
 
@@ -208,12 +581,14 @@ if uploaded_file is not None:
         with status_placeholder:
             col_status, col_cancel = st.columns([3, 1])
             with col_status:
-                # Using st.status for better visual feedback during processing
-                with st.spinner("Transcribing audio... Please wait."):
-                    # This block now mainly waits. The actual request happens below.
-                    # We don't use a fake progress bar anymore.
-                    # You can update this message if backend provided stages
-                    st.write("Processing...")
+                if len(uploaded_files) == 1:
+                    # Progress reflects bytes sent; once the upload is done the
+                    # bar stays full while the backend transcribes
+                    upload_progress = st.progress(0, text="Uploading audio...")
+                else:
+                    upload_progress = st.progress(
+                        0, text=f"Transcribing {len(uploaded_files)} files...")
+                segment_preview = st.empty()
 
             with col_cancel:
                 if st.button("Cancel", type="secondary", use_container_width=True):
@@ -225,10 +600,17 @@ if uploaded_file is not None:
         # Perform the actual transcription request outside the spinner for clarity
         # This check ensures we only run the request once per "running" state trigger
         # We rely on rerun triggering this part *after* state is set to running
-        if st.session_state.result is None and st.session_state.error_message is None:
-            # Make the blocking request here
-            api_result = request_transcription(
-                uploaded_file, transcription_settings)
+        if not st.session_state.results and st.session_state.error_message is None:
+            # Make the blocking request(s) here: a single file streams its
+            # segments back, several files are sent in parallel
+            if len(uploaded_files) == 1:
+                api_result = request_transcription(
+                    uploaded_files[0], transcription_settings, upload_progress, segment_preview)
+                results = [make_result_entry(uploaded_files[0].name, result=api_result)] \
+                    if api_result else []
+            else:
+                results = transcribe_files_in_parallel(
+                    uploaded_files, transcription_settings, upload_progress)
 
             # Check if cancelled *during* the request
             if st.session_state.transcription_state == "cancelled":
@@ -236,8 +618,16 @@ if uploaded_file is not None:
                 # Don't proceed to success/error state if cancelled
                 st.rerun()
 
-            elif api_result:
-                st.session_state.result = api_result
+            elif results and all(entry["error"] for entry in results):
+                # Nothing came back (backend down, every file turned away)
+                st.session_state.error_message = (
+                    f"All {len(results)} files failed. {results[0]['error']}"
+                    if len(results) > 1 else results[0]["error"])
+                st.session_state.transcription_state = "error"
+                st.rerun()  # Rerun to display error
+
+            elif results:
+                st.session_state.results = results
                 st.session_state.transcription_state = "success"
                 st.rerun()  # Rerun to display results
             # If request_transcription didn't already set error
@@ -253,129 +643,26 @@ if uploaded_file is not None:
             reset_state()
             st.rerun()
 
-    elif st.session_state.transcription_state == "success" and st.session_state.result:
-        status_placeholder.success("Transcription complete!")
-        result = st.session_state.result
-        file_info = st.session_state.uploaded_file_info
+    elif st.session_state.transcription_state == "success" and st.session_state.results:
+        results = st.session_state.results
+        failed = sum(1 for entry in results if entry["error"])
+        if failed:
+            status_placeholder.warning(
+                f"Transcribed {len(results) - failed} of {len(results)} files; {failed} failed.")
+        else:
+            status_placeholder.success("Transcription complete!")
+        word_timestamps_requested = transcription_settings.get(
+            "word_timestamps", False)
 
         with result_placeholder:
-            st.subheader("Transcription Text")
-            st.markdown(
-                f'<div class="result-area">{result["text"]}</div>', unsafe_allow_html=True)
-
-            detected_language = result.get("language", "unknown")
-            st.info(f"Detected language: {detected_language}")
-
-            # Add formatted timestamps displays
-            if "segments" in result and result["segments"]:
-                # Create tabs for different timestamp formats
-                tab1, tab2, tab3 = st.tabs(
-                    ["Subtitle Format", "SRT Format", "Word Timestamps"])
-
-                with tab1:
-                    # Custom subtitle format
-                    formatted_lines = format_timestamps_as_subtitles(result)
-                    if formatted_lines:
-                        formatted_text = "\n".join(formatted_lines)
-                        st.text_area("Subtitle Format",
-                                     formatted_text, height=300)
-
-                        subtitle_bytes = formatted_text.encode("utf-8")
-                        st.download_button(
-                            label="Download Formatted Timestamps",
-                            data=BytesIO(subtitle_bytes),
-                            file_name=f"{file_info['name'].split('.')[0]}_subtitles.txt",
-                            mime="text/plain",
-                            use_container_width=True
-                        )
-                    else:
-                        st.warning(
-                            "No segment data available to format timestamps.")
-
-                with tab2:
-                    # SRT format
-                    srt_content = generate_srt_content(result)
-                    if srt_content:
-                        st.text_area("SRT Format", srt_content, height=300)
-
-                        srt_bytes = srt_content.encode("utf-8")
-                        st.download_button(
-                            label="Download SRT Subtitle File",
-                            data=BytesIO(srt_bytes),
-                            file_name=f"{file_info['name'].split('.')[0]}.srt",
-                            mime="text/plain",
-                            use_container_width=True
-                        )
-                    else:
-                        st.warning(
-                            "No segment data available to generate SRT file.")
-
-                with tab3:
-                    # Original word timestamps (only show if word_timestamps was requested)
-                    word_timestamps_requested = transcription_settings.get(
-                        "word_timestamps", False)
-                    if word_timestamps_requested and "segments" in result and result["segments"]:
-                        # Check if first segment has 'words' key
-                        if result["segments"][0] and "words" in result["segments"][0]:
-                            segments = result["segments"]
-                            for i, segment in enumerate(segments):
-                                st.markdown(
-                                    f"**Segment {i+1}:** {segment.get('text', '')}")
-                                if "words" in segment:
-                                    words_data = []
-                                    for word in segment["words"]:
-                                        words_data.append({
-                                            "Word": word.get("word", ""),
-                                            "Start": f"{word.get('start', 0):.2f}s",
-                                            "End": f"{word.get('end', 0):.2f}s"
-                                        })
-                                    st.dataframe(words_data)
-                        else:
-                            st.caption(
-                                "Word timestamps were requested but not generated by the model for this audio.")
-                    else:
-                        st.info(
-                            "Word-level timestamps were not requested in the transcription settings.")
-
-            # Download Buttons section - expanded with columns for all download options
-            col_dl1, col_dl2, col_dl3 = st.columns(3)
-            with col_dl1:
-                transcript_bytes = result["text"].encode("utf-8")
-                st.download_button(
-                    label="Download Transcript (.txt)",
-                    data=BytesIO(transcript_bytes),
-                    file_name=f"{file_info['name'].split('.')[0]}_transcript.txt",
-                    mime="text/plain",
-                    use_container_width=True
-                )
-
-            # Add SRT download in the second column
-            if "segments" in result and result["segments"]:
-                with col_dl2:
-                    srt_content = generate_srt_content(result)
-                    if srt_content:
-                        srt_bytes = srt_content.encode("utf-8")
-                        st.download_button(
-                            label="Download SRT Subtitles",
-                            data=BytesIO(srt_bytes),
-                            file_name=f"{file_info['name'].split('.')[0]}.srt",
-                            mime="text/plain",
-                            use_container_width=True
-                        )
-
-            # Keep JSON download in the third column
-            word_timestamps_requested = transcription_settings.get(
-                "word_timestamps", False)
-            if word_timestamps_requested and "segments" in result and result["segments"] and result["segments"][0] and "words" in result["segments"][0]:
-                with col_dl3:
-                    json_bytes = json.dumps(result, indent=2).encode("utf-8")
-                    st.download_button(
-                        label="Download Full JSON",
-                        data=BytesIO(json_bytes),
-                        file_name=f"{file_info['name'].split('.')[0]}_full_transcript.json",
-                        mime="application/json",
-                        use_container_width=True
-                    )
+            if len(results) == 1:
+                render_result(results[0], word_timestamps_requested)
+            else:
+                # One tab per file, in upload order
+                file_tabs = st.tabs([entry["name"] for entry in results])
+                for file_tab, entry in zip(file_tabs, results):
+                    with file_tab:
+                        render_result(entry, word_timestamps_requested)
 
     elif st.session_state.transcription_state == "error":
         if st.session_state.error_message:
@@ -4,9 +4,13 @@ Frontend utility functions for handling transcription data formatting.
 This module contains helper functions for formatting timestamps and subtitles
 for the MLX Whisper transcription application.
 """
-from io import BytesIO
+import orjson
+from functools import lru_cache
+from operator import itemgetter
+import numpy as np
 
 
+@lru_cache(maxsize=8192)
 def format_time(seconds: float) -> str:
     """
     Format seconds as MM:SS.mmm for custom timestamp format.
@@ -17,12 +21,11 @@ def format_time(seconds: float) -> str:
     Returns:
         Formatted time string in MM:SS.mmm format
     """
-    minutes = int(seconds // 60)
-    remaining_seconds = seconds % 60
-
-    # Format to ensure we have 2 digits for minutes, 2 digits for seconds, and 3 digits for milliseconds
-    milliseconds = int((remaining_seconds % 1) * 1000)
-    whole_seconds = int(remaining_seconds)
+    # Work in integer milliseconds: one rounded conversion, then integer
+    # divmods (truncating would turn e.g. 1.001s into 1.000)
+    milliseconds = round(seconds * 1000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    whole_seconds, milliseconds = divmod(milliseconds, 1000)
 
     return f"{minutes:02d}:{whole_seconds:02d}.{milliseconds:03d}"
 
@@ -37,79 +40,160 @@ def format_srt_time(seconds: float) -> str:
     Returns:
         Formatted time string in HH:MM:SS,mmm format for SRT subtitles
     """
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    remaining_seconds = seconds % 60
-
-    # Format to ensure proper SRT time format: HH:MM:SS,mmm
-    milliseconds = int((remaining_seconds % 1) * 1000)
-    whole_seconds = int(remaining_seconds)
+    # Work in integer milliseconds: one rounded conversion, then integer
+    # divmods (truncating would turn e.g. 1.001s into 1.000)
+    milliseconds = round(seconds * 1000)
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    whole_seconds, milliseconds = divmod(milliseconds, 1000)
 
     return f"{hours:02d}:{minutes:02d}:{whole_seconds:02d},{milliseconds:03d}"
 
 
-def format_timestamps_as_subtitles(result: dict) -> list:
+# Zero-padded strings for every seconds/minutes and milliseconds value;
+# indexing these is several times cheaper than a :02d/:03d format spec
+_PADDED_2 = tuple(f"{i:02d}" for i in range(100))
+_PADDED_3 = tuple(f"{i:03d}" for i in range(1000))
+
+
+def _leading_padding(values: list):
     """
-    Convert segments to custom subtitle format with [MM:SS.mmm --> MM:SS.mmm] text.
+    Lookup for the leading (unbounded) field: the shared table when every
+    value fits in it, otherwise a mapping built for the values present.
+    """
+    if not values or (min(values) >= 0 and max(values) < 100):
+        return _PADDED_2
+    return {value: f"{value:02d}" for value in set(values)}
+
+
+def _split_milliseconds(times, *units: int) -> list:
+    """
+    Split an array of times in seconds into integer fields, one divmod per
+    unit (in milliseconds), for the whole array at once.
+
+    Returns one Python list per unit plus the remaining milliseconds.
+    """
+    remainder = np.rint(np.asarray(times, dtype=np.float64) * 1000).astype(np.int64)
+    fields = []
+    for unit in units:
+        quotient, remainder = np.divmod(remainder, unit)
+        fields.append(quotient.tolist())
+    fields.append(remainder.tolist())
+    return fields
+
+
+def format_times(times) -> list:
+    """
+    Vectorized format_time: format many times in seconds as MM:SS.mmm.
 
     Args:
-        result: Transcription result dictionary containing segments
+        times: Sequence or array of times in seconds
 
     Returns:
-        List of formatted subtitle strings
+        List of formatted time strings in MM:SS.mmm format
     """
-    formatted_lines = []
+    minutes, seconds, milliseconds = _split_milliseconds(times, 60_000, 1000)
+    padded_minutes = _leading_padding(minutes)
+    return [f"{padded_minutes[m]}:{_PADDED_2[s]}.{_PADDED_3[ms]}"
+            for m, s, ms in zip(minutes, seconds, milliseconds)]
 
-    if "segments" not in result or not result["segments"]:
-        return formatted_lines
 
-    for segment in result["segments"]:
-        if "start" not in segment or "end" not in segment or "text" not in segment:
-            continue
+def format_srt_times(times) -> list:
+    """
+    Vectorized format_srt_time: format many times in seconds as HH:MM:SS,mmm.
 
-        start_formatted = format_time(segment["start"])
-        end_formatted = format_time(segment["end"])
+    Args:
+        times: Sequence or array of times in seconds
 
-        line = f"[{start_formatted} --> {end_formatted}]  {segment['text'].strip()}"
-        formatted_lines.append(line)
+    Returns:
+        List of formatted time strings in HH:MM:SS,mmm format
+    """
+    hours, minutes, seconds, milliseconds = _split_milliseconds(
+        times, 3_600_000, 60_000, 1000)
+    padded_hours = _leading_padding(hours)
+    return [f"{padded_hours[h]}:{_PADDED_2[m]}:{_PADDED_2[s]},{_PADDED_3[ms]}"
+            for h, m, s, ms in zip(hours, minutes, seconds, milliseconds)]
 
-    return formatted_lines
 
+# Fetches a segment's start, end and text in one C-level call
+_segment_fields = itemgetter("start", "end", "text")
 
-def generate_srt_content(result: dict) -> str:
+
+def _valid_segments(result: dict) -> list:
     """
-    Generate SRT (SubRip Text) formatted content.
+    Return (index, start, end, text) tuples for the segments that have a
+    start, end and text, skipping malformed ones.
+    """
+    valid = []
+    for i, segment in enumerate(result["segments"], 1):
+        try:
+            start, end, text = _segment_fields(segment)
+        except KeyError:
+            continue
+        valid.append((i, start, end, text))
+    return valid
+
+
+def render_subtitles(result: dict) -> tuple:
+    """
+    Render the custom subtitle lines and the SRT content from one walk of
+    the segments.
 
     Args:
         result: Transcription result dictionary containing segments
 
     Returns:
-        String containing properly formatted SRT subtitle content
+        Tuple containing (formatted_lines, srt_content)
     """
-    srt_lines = []
-
     if "segments" not in result or not result["segments"]:
-        return ""
+        return [], ""
 
-    for i, segment in enumerate(result["segments"], 1):
-        if "start" not in segment or "end" not in segment or "text" not in segment:
-            continue
+    segments = _valid_segments(result)
+    if not segments:
+        return [], ""
+
+    indices, starts, ends, texts = zip(*segments)
+    texts = [text.strip() for text in texts]
+    # Format every timestamp in array passes instead of per segment
+    sub_starts, sub_ends = format_times(starts), format_times(ends)
+    srt_starts, srt_ends = format_srt_times(starts), format_srt_times(ends)
+
+    # Custom subtitle lines
+    formatted_lines = [f"[{sub_start} --> {sub_end}]  {text}"
+                       for sub_start, sub_end, text in zip(sub_starts, sub_ends, texts)]
+
+    # SRT entries: index number, timestamp line and text line; the join
+    # below adds the blank separator line between entries
+    srt_entries = [f"{i}\n{srt_start} --> {srt_end}\n{text}\n"
+                   for i, srt_start, srt_end, text in zip(indices, srt_starts, srt_ends, texts)]
+
+    return formatted_lines, "\n".join(srt_entries)
+
+
+def format_timestamps_as_subtitles(result: dict) -> list:
+    """
+    Convert segments to custom subtitle format with [MM:SS.mmm --> MM:SS.mmm] text.
 
-        # SRT index number
-        srt_lines.append(str(i))
+    Args:
+        result: Transcription result dictionary containing segments
 
-        # SRT timestamp line
-        start_formatted = format_srt_time(segment["start"])
-        end_formatted = format_srt_time(segment["end"])
-        srt_lines.append(f"{start_formatted} --> {end_formatted}")
+    Returns:
+        List of formatted subtitle strings
+    """
+    return render_subtitles(result)[0]
 
-        # SRT text line
-        srt_lines.append(segment["text"].strip())
 
-        # Empty line between entries
-        srt_lines.append("")
+def generate_srt_content(result: dict) -> str:
+    """
+    Generate SRT (SubRip Text) formatted content.
 
-    return "\n".join(srt_lines)
+    Args:
+        result: Transcription result dictionary containing segments
+
+    Returns:
+        String containing properly formatted SRT subtitle content
+    """
+    return render_subtitles(result)[1]
 
 
 def get_subtitle_download_buttons(result: dict, file_info: dict) -> tuple:
@@ -126,17 +210,13 @@ def get_subtitle_download_buttons(result: dict, file_info: dict) -> tuple:
     # Basic transcript
     transcript_bytes = result["text"].encode("utf-8")
 
-    # SRT format
-    srt_content = generate_srt_content(result)
+    # Custom subtitle and SRT formats, rendered together
+    formatted_lines, srt_content = render_subtitles(result)
     srt_bytes = srt_content.encode("utf-8") if srt_content else None
-
-    # Custom subtitle format
-    formatted_lines = format_timestamps_as_subtitles(result)
     subtitle_bytes = "\n".join(formatted_lines).encode(
         "utf-8") if formatted_lines else None
 
     # JSON format (full data)
-    import json
-    json_bytes = json.dumps(result, indent=2).encode("utf-8")
+    json_bytes = orjson.dumps(result, option=orjson.OPT_INDENT_2)
 
     return transcript_bytes, srt_bytes, subtitle_bytes, json_bytes